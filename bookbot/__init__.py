@@ -4,14 +4,18 @@ import logging
 import os
 import sys
 
-_handlers: list[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+_ON_RENDER = bool(os.environ.get("RENDER"))
 
-# Also log to a file when running locally (not on Fly.io)
-if not os.environ.get("RENDER"):
-    _handlers.append(logging.FileHandler("bookbot.log"))
+# Configure logging only once, even if the package is re-imported
+if not logging.getLogger().hasHandlers():
+    _handlers: list[logging.Handler] = [logging.StreamHandler(sys.stdout)]
 
-logging.basicConfig(
-    handlers=_handlers,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
+    # Also log to a file when running locally (not on Render)
+    if not _ON_RENDER:
+        _handlers.append(logging.FileHandler("bookbot.log"))
+
+    logging.basicConfig(
+        handlers=_handlers,
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+    )
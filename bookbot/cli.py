@@ -1,54 +1,81 @@
 """Command-line interface — input collection, display, and main loop."""
 
-import re
+import sys
+import time
 import logging
+from collections.abc import Callable
 
 from bookbot.i18n import (
     set_language,
-    get_language,
     t,
     genre_display_names,
     lookup_genre,
 )
 from bookbot.recommender import (
-    FAMILIARITY_MAP,
-    MAX_RETRIES,
+    _FAMILIARITY_LEVELS,
+    LLMTransientError,
+    LLMUnavailableError,
+    Recommendation,
     get_system_prompt,
     build_user_prompt,
-    call_llm,
+    build_messages_prefix,
+    call_llm_prepared,
+    canonical_title,
     parse_llm_output,
+    repair_llm_output,
+    retry_delay,
     validate_recommendations,
 )
+from bookbot.validation import (
+    MAX_CJK_TITLE_LENGTH,
+    MAX_STRING_LENGTH,
+    contains_prompt_injection,
+    is_valid_book_title,
+)
 
-# ---------------------------------------------------------------------------
-# Constants
-# ---------------------------------------------------------------------------
-MAX_STRING_LENGTH = 200  # reject absurdly long input strings
+# recommender.call_llm* make one request each; this loop does the retrying
+MAX_ATTEMPTS = 3
 
-PROMPT_INJECTION_PATTERNS = [
-    r"ignore previous instructions",
-    r"pretend you are",
-    r"disregard.*prompt",
-    r"forget your instructions",
-    r"you are now",
-    r"act as if",
-    r"new persona",
-    r"override.*system",
-]
+# (input separator, display separator) per language
+_SEPARATORS = {
+    "en": (",", ", "),
+    "zh": ("，", "、"),
+}
+# Updated by select_language() so the split/join helpers skip the lookup
+_CURRENT_SEP = _SEPARATORS["en"]
 
 
 def _split_by_comma(text: str) -> list[str]:
     """Split input by the appropriate comma for the active language."""
-    if get_language() == "zh":
-        return [s.strip() for s in text.split("，") if s.strip()]
-    return [s.strip() for s in text.split(",") if s.strip()]
+    sep = _CURRENT_SEP[0]
+    return [s.strip() for s in text.split(sep) if s.strip()]
 
 
 def _join_by_comma(items: list[str]) -> str:
     """Join items with the appropriate separator for the active language."""
-    if get_language() == "zh":
-        return "、".join(items)
-    return ", ".join(items)
+    return _CURRENT_SEP[1].join(items)
+
+
+def _build_menus() -> None:
+    """Pre-render the static re-prompt menus in the active language."""
+    global _GENRE_HEADER, _FAM_MENU
+    _GENRE_HEADER = t("genre_list", genres=_join_by_comma(genre_display_names())) + "\n"
+    _FAM_MENU = "\n".join(
+        t(key) for key in ("fam_header", "fam_1", "fam_2", "fam_3", "fam_4")
+    ) + "\n"
+
+
+def _set_cli_language(lang: str) -> None:
+    """Switch the active language, cached separators, and menus together."""
+    global _CURRENT_SEP
+    set_language(lang)
+    _CURRENT_SEP = _SEPARATORS[lang]
+    _build_menus()
+
+
+_GENRE_HEADER = ""
+_FAM_MENU = ""
+_build_menus()
 
 
 # ===================================================================
@@ -62,10 +89,10 @@ def select_language() -> None:
         print(t("lang_option_2"))
         raw = input(t("lang_input")).strip()
         if raw == "1":
-            set_language("en")
+            _set_cli_language("en")
             return
         elif raw == "2":
-            set_language("zh")
+            _set_cli_language("zh")
             return
         else:
             print(t("lang_invalid"))
@@ -74,32 +101,13 @@ def select_language() -> None:
 # ===================================================================
 # LAYER 1: INPUT VALIDATION
 # ===================================================================
-def _is_valid_book_title(title: str) -> bool:
-    """Return True if the string looks like a reasonable book title."""
-    if not title or len(title) > MAX_STRING_LENGTH:
-        return False
-    # reject strings that are only symbols / punctuation
-    # allow Latin letters, digits, and CJK characters
-    if not re.search(r"[a-zA-Z0-9\u4e00-\u9fff]", title):
-        return False
-    return True
-
-
-def _contains_prompt_injection(text: str) -> bool:
-    """Return True if text matches any known prompt-injection pattern."""
-    for pattern in PROMPT_INJECTION_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
-
-
 def validate_genres() -> list[str]:
     """Prompt the user for 1-3 genres from the allowed list.
     Re-prompts on invalid input until valid."""
     display_names = genre_display_names()
 
     while True:
-        print(t("genre_list", genres=_join_by_comma(display_names)))
+        sys.stdout.write(_GENRE_HEADER)
         raw = input(t("genre_prompt")).strip()
 
         if not raw:
@@ -112,22 +120,29 @@ def validate_genres() -> list[str]:
             print(t("genre_count"))
             continue
 
-        # Map display names to internal names
+        # Map display names to internal names, stopping at the first duplicate
         internal_names = []
         invalid = []
+        seen = set()
+        duplicate = False
         for g in parts:
             mapped = lookup_genre(g)
             if mapped is None:
                 invalid.append(g)
-            else:
-                internal_names.append(mapped)
+                continue
+            if mapped in seen:
+                duplicate = True
+                break
+            seen.add(mapped)
+            # interned so downstream comparisons can hit the identity fast path
+            internal_names.append(sys.intern(mapped))
 
         if invalid:
             print(t("genre_invalid", invalid=_join_by_comma(invalid)))
             print(t("genre_allowed", genres=_join_by_comma(display_names)))
             continue
 
-        if len(internal_names) != len(set(internal_names)):
+        if duplicate:
             print(t("genre_dup"))
             continue
 
@@ -145,7 +160,7 @@ def validate_books() -> list[str]:
             continue
 
         # Content filter: reject prompt-injection attempts
-        if _contains_prompt_injection(raw):
+        if contains_prompt_injection(raw):
             logging.warning("Prompt injection attempt detected: %s", raw)
             print(t("book_injection"))
             continue
@@ -156,9 +171,14 @@ def validate_books() -> list[str]:
             print(t("book_count"))
             continue
 
-        bad = [b for b in parts if not _is_valid_book_title(b)]
+        bad = [b for b in parts if not is_valid_book_title(b)]
         if bad:
-            print(t("book_invalid", bad=bad, max_len=MAX_STRING_LENGTH))
+            print(t(
+                "book_invalid",
+                bad=bad,
+                max_len=MAX_STRING_LENGTH,
+                max_cjk=MAX_CJK_TITLE_LENGTH,
+            ))
             continue
 
         return parts
@@ -168,11 +188,7 @@ def validate_familiarity() -> int:
     """Prompt the user for a familiarity preference (1-4).
     Re-prompts on invalid input until valid."""
     while True:
-        print(t("fam_header"))
-        print(t("fam_1"))
-        print(t("fam_2"))
-        print(t("fam_3"))
-        print(t("fam_4"))
+        sys.stdout.write(_FAM_MENU)
         raw = input(t("fam_prompt")).strip()
 
         if not raw:
@@ -185,7 +201,7 @@ def validate_familiarity() -> int:
             print(t("fam_nan"))
             continue
 
-        if choice not in FAMILIARITY_MAP:
+        if choice not in _FAMILIARITY_LEVELS:
             print(t("fam_range"))
             continue
 
@@ -217,15 +233,15 @@ def collect_preferences() -> dict:
 # ===================================================================
 # DISPLAY
 # ===================================================================
-def display_recommendations(recs: list[dict]) -> None:
+def display_recommendations(recs: list[Recommendation]) -> None:
     """Pretty-print the final recommendations."""
     print("\n" + "=" * 55)
     print(t("rec_header"))
     print("=" * 55)
     for i, rec in enumerate(recs, 1):
-        print(f"\n  {i}. {rec['title']} by {rec['author']} "
-              f"({rec['publication_year']})")
-        print(f"     {rec['explanation']}")
+        print(f"\n  {i}. {rec.title} by {rec.author} "
+              f"({rec.publication_year})")
+        print(f"     {rec.explanation}")
     print()
     print("=" * 55)
 
@@ -233,67 +249,91 @@ def display_recommendations(recs: list[dict]) -> None:
 # ===================================================================
 # ORCHESTRATION
 # ===================================================================
-def _filter_duplicates(recs: list[dict], already: list[str]) -> list[dict]:
-    """Remove recommendations whose titles have already been suggested."""
-    if not already:
-        return recs
-    seen = {title.strip().lower() for title in already}
-    filtered = [r for r in recs if r["title"].strip().lower() not in seen]
-    removed = len(recs) - len(filtered)
-    if removed:
-        logging.info("Removed %d duplicate(s) that were already recommended.", removed)
-    return filtered
+def _streamed_announcer(seen: set[str]) -> Callable[[dict], None]:
+    """Return a callback that shows each candidate title as it streams in.
+
+    Items with a missing title or author, titles in *seen* (already
+    recommended), and repeats within the reply are not shown.  The rest are
+    still unvalidated, so the message presents them as candidates.
+    """
+    announced: set[str] = set()
+
+    def announce(rec: dict) -> None:
+        title = rec.get("title")
+        author = rec.get("author")
+        if not (isinstance(title, str) and title.strip()):
+            return
+        if not (isinstance(author, str) and author.strip()):
+            return
+        key = canonical_title(title)
+        if key in seen or key in announced:
+            return
+        announced.add(key)
+        print(t("rec_found", title=title.strip()))
+
+    return announce
 
 
 def generate_recommendations(
     user_prompt: str,
     prefs: dict,
-    already_recommended: list[str] | None = None,
-) -> list[dict] | None:
+    seen_titles: set[str] | None = None,
+) -> list[Recommendation] | None:
     """Run Layers 3-5: call LLM, parse, validate, and display.
     Returns the list of recommendations on success, or None if all attempts failed.
 
-    *already_recommended* is a list of titles from previous rounds;
-    any duplicates are stripped from the result before display.
+    *seen_titles* is the set of normalised (stripped, lowercased) titles
+    from previous rounds; any duplicates are stripped from the result
+    before display.
     """
-    system_prompt = get_system_prompt()
-    already = already_recommended or []
+    messages_prefix = build_messages_prefix(get_system_prompt())
+    seen = seen_titles or set()
+    announce = _streamed_announcer(seen)
 
-    for attempt in range(1, MAX_RETRIES + 1):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
         print(t("searching"))
 
         # Layer 3: LLM Call
-        raw = call_llm(system_prompt, user_prompt)
+        try:
+            raw = call_llm_prepared(messages_prefix, user_prompt, announce)
+        except LLMUnavailableError:
+            break  # retrying cannot fix an auth or bad-request error
+        except LLMTransientError:
+            raw = None
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(retry_delay(attempt))
         if raw is None:
             logging.error("LLM call returned None on attempt %d", attempt)
-            if attempt < MAX_RETRIES:
+            if attempt < MAX_ATTEMPTS:
                 print(t("retry_llm"))
                 continue
             break
 
         # Layer 4: Output Parsing
         parsed = parse_llm_output(raw)
+        if parsed is None:
+            # Try a local repair before spending another LLM call
+            parsed = repair_llm_output(raw)
         if parsed is None:
             logging.error("Parsing failed on attempt %d", attempt)
-            if attempt < MAX_RETRIES:
+            if attempt < MAX_ATTEMPTS:
                 print(t("retry_parse"))
                 continue
             break
 
         # Layer 5: Business Logic Validation
-        final = validate_recommendations(parsed, prefs)
+        # Layer 6 (duplicate check) runs inside validation via *exclude*
+        final = validate_recommendations(parsed, prefs, exclude=seen)
         if final is None:
             logging.error("Business validation failed on attempt %d", attempt)
-            if attempt < MAX_RETRIES:
+            if attempt < MAX_ATTEMPTS:
                 print(t("retry_validate"))
                 continue
             break
 
-        # Layer 6: Duplicate Check — remove already-recommended titles
-        final = _filter_duplicates(final, already)
         if not final:
             logging.warning("All recommendations were duplicates on attempt %d", attempt)
-            if attempt < MAX_RETRIES:
+            if attempt < MAX_ATTEMPTS:
                 continue
             break
 
@@ -319,19 +359,21 @@ def main() -> None:
 
     # --- Generate, display, and offer more ---
     already_recommended: list[str] = []
+    seen_lower: set[str] = set()
 
     while True:
         # --- Layer 2: Prompt Construction (rebuilt each round) ---
         user_prompt = build_user_prompt(prefs, exclude=already_recommended or None)
         logging.info("User prompt:\n%s", user_prompt)
 
-        recs = generate_recommendations(user_prompt, prefs, already_recommended)
+        recs = generate_recommendations(user_prompt, prefs, seen_lower)
 
         if recs is None:
             break
 
         # Track titles so the next round excludes them
-        already_recommended.extend(rec["title"] for rec in recs)
+        already_recommended.extend(rec.title for rec in recs)
+        seen_lower.update(canonical_title(rec.title) for rec in recs)
 
         # Ask if the user wants another round (exact yes/no or 是/否)
         while True:
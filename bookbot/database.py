@@ -1,9 +1,11 @@
 """SQLite database for BookBot subscriptions and recommendation history."""
 
+import atexit
 import json
 import logging
 import os
 import sqlite3
+import threading
 import uuid
 from contextlib import contextmanager
 
@@ -16,6 +18,9 @@ DB_PATH = os.path.join(_DB_DIR, "bookbot.db")
 # ---------------------------------------------------------------------------
 # Schema
 # ---------------------------------------------------------------------------
+# Bump whenever _SCHEMA or the migrations in init_db() change
+SCHEMA_VERSION = 1
+
 _SCHEMA = """\
 CREATE TABLE IF NOT EXISTS subscriptions (
     id                INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,39 +41,79 @@ CREATE TABLE IF NOT EXISTS recommendation_history (
     titles          TEXT    NOT NULL,   -- JSON array
     sent_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE INDEX IF NOT EXISTS idx_rec_hist_sub ON recommendation_history(subscription_id);
+CREATE INDEX IF NOT EXISTS idx_sub_active ON subscriptions(active) WHERE active = 1;
 """
 
 
+# Set by init_db() when SQLite was built with the JSON1 extension
+_HAS_JSON1 = False
+
+# One connection per thread, opened lazily and reused across helpers
+_local = threading.local()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Return this thread's cached connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _local.conn = conn
+    return conn
+
+
 @contextmanager
 def _connect():
-    """Yield a SQLite connection with WAL mode and foreign keys enabled."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
+    """Yield the cached connection, committing on success and rolling back on error."""
+    conn = _get_conn()
     try:
         yield conn
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    finally:
+
+
+def close_db() -> None:
+    """Close this thread's cached connection, if one is open."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
         conn.close()
+        _local.conn = None
+
+
+# atexit handlers run on the main thread, so this closes its connection;
+# the scheduler job closes its worker thread's own after each run
+atexit.register(close_db)
 
 
 def init_db() -> None:
     """Create tables if they don't already exist."""
+    global _HAS_JSON1
     with _connect() as conn:
-        conn.executescript(_SCHEMA)
-        # Migrate: add frequency column to existing databases
+        # Skip the schema script on databases that are already up to date
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            conn.executescript(_SCHEMA)
+            # Migrate: add frequency column to existing databases
+            try:
+                conn.execute(
+                    "ALTER TABLE subscriptions ADD COLUMN frequency TEXT NOT NULL DEFAULT 'monthly' "
+                    "CHECK(frequency IN ('daily', 'weekly', 'monthly'))"
+                )
+                logging.info("Migrated subscriptions table: added frequency column")
+            except sqlite3.OperationalError:
+                pass  # column already exists
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         try:
-            conn.execute(
-                "ALTER TABLE subscriptions ADD COLUMN frequency TEXT NOT NULL DEFAULT 'monthly' "
-                "CHECK(frequency IN ('daily', 'weekly', 'monthly'))"
-            )
-            logging.info("Migrated subscriptions table: added frequency column")
+            conn.execute("SELECT json_group_array(value) FROM json_each('[]')")
+            _HAS_JSON1 = True
         except sqlite3.OperationalError:
-            pass  # column already exists
+            _HAS_JSON1 = False
+            logging.info("SQLite JSON1 extension unavailable; parsing history in Python")
     logging.info("Database initialised at %s", DB_PATH)
 
 
@@ -153,6 +198,28 @@ def get_active_subscriptions() -> list[dict]:
         rows = conn.execute(
             "SELECT * FROM subscriptions WHERE active = 1"
         ).fetchall()
+    return _subscription_dicts(rows)
+
+
+def get_active_subscriptions_for_frequencies(frequencies: list[str]) -> list[dict]:
+    """Return the active subscriptions whose frequency is in *frequencies*.
+
+    The scheduler passes the frequencies that are due today, so only due
+    rows leave the database.
+    """
+    if not frequencies:
+        return []
+    placeholders = ", ".join("?" * len(frequencies))
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM subscriptions WHERE active = 1 AND frequency IN ({placeholders})",
+            frequencies,
+        ).fetchall()
+    return _subscription_dicts(rows)
+
+
+def _subscription_dicts(rows: list[sqlite3.Row]) -> list[dict]:
+    """Convert subscription rows to dicts with decoded genres/books."""
     result = []
     for row in rows:
         d = dict(row)
@@ -167,6 +234,21 @@ def get_active_subscriptions() -> list[dict]:
 # ---------------------------------------------------------------------------
 def get_recommended_titles(subscription_id: int) -> list[str]:
     """Return all previously recommended titles for a subscription."""
+    if _HAS_JSON1:
+        # Flatten every stored JSON array into one array inside SQLite
+        with _connect() as conn:
+            row = conn.execute(
+                """\
+                SELECT json_group_array(value) FROM (
+                    SELECT j.value
+                      FROM recommendation_history AS h, json_each(h.titles) AS j
+                     WHERE h.subscription_id = ?
+                     ORDER BY h.id, j.key
+                )""",
+                (subscription_id,),
+            ).fetchone()
+        return json.loads(row[0] or "[]")
+
     with _connect() as conn:
         rows = conn.execute(
             "SELECT titles FROM recommendation_history WHERE subscription_id = ?",
@@ -188,3 +270,15 @@ def add_history(subscription_id: int, titles: list[str]) -> None:
     logging.info(
         "Recorded %d titles for subscription %d", len(titles), subscription_id
     )
+
+
+def add_history_many(rows: list[tuple[int, list[str]]]) -> None:
+    """Record several ``(subscription_id, titles)`` batches in one transaction."""
+    if not rows:
+        return
+    with _connect() as conn:
+        conn.executemany(
+            "INSERT INTO recommendation_history (subscription_id, titles) VALUES (?, ?)",
+            [(sid, json.dumps(titles)) for sid, titles in rows],
+        )
+    logging.info("Recorded %d history batch(es)", len(rows))
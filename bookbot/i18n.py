@@ -28,7 +28,9 @@ def t(key: str, **kwargs) -> str:
     text = STRINGS.get(_lang, STRINGS["en"]).get(key)
     if text is None:
         text = STRINGS["en"].get(key, f"[missing:{key}]")
-    return text.format(**kwargs) if kwargs else text
+    if kwargs and "{" in text:
+        return text.format(**kwargs)
+    return text
 
 
 # ---------------------------------------------------------------------------
@@ -65,6 +67,17 @@ GENRE_LOOKUP: dict[str, dict[str, str]] = {
     for lang, mapping in GENRE_DISPLAY.items()
 }
 
+# Per-language table used by lookup_genre(): the language's own names
+# layered over the English fallback, keyed by lowercased display name
+_GENRE_REVERSE: dict[str, dict[str, str]] = {
+    lang: {
+        display.lower(): internal
+        for table in (GENRE_LOOKUP["en"], GENRE_LOOKUP[lang])
+        for display, internal in table.items()
+    }
+    for lang in GENRE_LOOKUP
+}
+
 
 def genre_display_names() -> list[str]:
     """Return the list of genre display names in the active language."""
@@ -74,12 +87,9 @@ def genre_display_names() -> list[str]:
 def lookup_genre(user_input: str) -> str | None:
     """Map a user-typed genre name (in the active language) to the internal
     English name.  Returns None if unrecognised."""
-    normed = user_input.strip().lower()
-    # Try active language first, then English as fallback
-    result = GENRE_LOOKUP.get(_lang, {}).get(normed)
-    if result is None:
-        result = GENRE_LOOKUP["en"].get(normed)
-    return result
+    # Active language first, then English as fallback -- one dict probe
+    table = _GENRE_REVERSE.get(_lang, _GENRE_REVERSE["en"])
+    return table.get(user_input.strip().lower())
 
 
 # ---------------------------------------------------------------------------
@@ -112,7 +122,7 @@ STRINGS: dict[str, dict[str, str]] = {
         "book_empty":       "Oops — you didn't type anything! Tell me about some books you love.",
         "book_injection":   "Nice try, but that doesn't look like a book title to me!",
         "book_count":       "I need exactly 2 or 3 books, no more, no less!",
-        "book_invalid":     "Hmm, these don't look like real titles: {bad}. Book titles should have actual words and be under {max_len} characters.",
+        "book_invalid":     "Hmm, these don't look like real titles: {bad}. Book titles should have actual words and be under {max_len} characters ({max_cjk} for Chinese titles).",
 
         # Familiarity prompts
         "fam_header":       "How adventurous are you feeling today?",
@@ -128,6 +138,7 @@ STRINGS: dict[str, dict[str, str]] = {
         # Recommendation display
         "rec_header":       "Ta-da! Here are your BookBot picks:",
         "searching":        "Rummaging through the shelves...",
+        "rec_found":        "  ...considering {title}",
         "retry_llm":        "Something went wrong with the LLM. Retrying...",
         "retry_parse":      "Could not parse LLM response. Retrying...",
         "retry_validate":   "Those recommendations didn't pass my quality check. One more try...",
@@ -177,7 +188,7 @@ STRINGS: dict[str, dict[str, str]] = {
         "book_empty":       "哎呀——你什么都没输入！告诉我你喜欢的书吧。",
         "book_injection":   "这看起来不太像书名哦！",
         "book_count":       "我需要 2 到 3 本书，不多不少！",
-        "book_invalid":     "嗯，这些看起来不像真正的书名: {bad}。书名应包含实际文字且不超过 {max_len} 个字符。",
+        "book_invalid":     "嗯，这些看起来不像真正的书名: {bad}。书名应包含实际文字且不超过 {max_len} 个字符（中文书名不超过 {max_cjk} 个字）。",
 
         # Familiarity prompts
         "fam_header":       "你偏向哪种推荐风格",
@@ -193,6 +204,7 @@ STRINGS: dict[str, dict[str, str]] = {
         # Recommendation display
         "rec_header":       "当当当！这是我为你精选的书单：",
         "searching":        "马上就来！正在翻阅书架...",
+        "rec_found":        "  ……正在考虑《{title}》",
         "retry_llm":        "LLM 出了点问题，正在重试...",
         "retry_parse":      "无法解析 LLM 的回复，正在重试...",
         "retry_validate":   "哎呀，这些推荐没通过质量检查，再试一次...",
@@ -216,3 +228,4 @@ STRINGS: dict[str, dict[str, str]] = {
         "sub_already":      "这个邮箱已经订阅了。",
     },
 }
+
@@ -1,14 +1,17 @@
 """Email sending utilities for BookBot monthly recommendations."""
 
+import base64
+import functools
 import logging
 import os
 import smtplib
 import urllib.parse
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.header import Header
 
 from dotenv import load_dotenv
 
+from bookbot.recommender import Recommendation
+
 load_dotenv()
 
 # ---------------------------------------------------------------------------
@@ -21,69 +24,77 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER)
 BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8000")
 
+# Titles recur across subscribers in a batch, so memoise their URL encoding
+_quote = functools.lru_cache(maxsize=4096)(urllib.parse.quote)
 
-def _build_html(recs: list[dict], language: str, unsubscribe_url: str, frequency: str = "monthly") -> str:
-    """Render an HTML email body for recommendations."""
-    is_zh = language == "zh"
 
-    freq_labels = {
-        "daily":   {"en": "Daily",   "zh": "每日"},
-        "weekly":  {"en": "Weekly",  "zh": "每周"},
-        "monthly": {"en": "Monthly", "zh": "每月"},
-    }
-    freq_intros = {
-        "daily":   {"en": "Here are your BookBot picks for today:",   "zh": "这是 BookBot 为你精选的今日书单："},
-        "weekly":  {"en": "Here are your BookBot picks for this week:", "zh": "这是 BookBot 为你精选的本周书单："},
-        "monthly": {"en": "Here are your BookBot picks for this month:", "zh": "这是 BookBot 为你精选的本月书单："},
+# ---------------------------------------------------------------------------
+# Per-(language, frequency) email text, resolved once at import
+# ---------------------------------------------------------------------------
+_FREQ_LABELS = {
+    "daily":   {"en": "Daily",   "zh": "每日"},
+    "weekly":  {"en": "Weekly",  "zh": "每周"},
+    "monthly": {"en": "Monthly", "zh": "每月"},
+}
+_FREQ_INTROS = {
+    "daily":   {"en": "Here are your BookBot picks for today:",   "zh": "这是 BookBot 为你精选的今日书单："},
+    "weekly":  {"en": "Here are your BookBot picks for this week:", "zh": "这是 BookBot 为你精选的本周书单："},
+    "monthly": {"en": "Here are your BookBot picks for this month:", "zh": "这是 BookBot 为你精选的本月书单："},
+}
+_FREQ_SUBJECTS = {
+    "daily":   {"en": "Your Daily BookBot Recommendations",   "zh": "BookBot 每日推荐书单"},
+    "weekly":  {"en": "Your Weekly BookBot Recommendations",  "zh": "BookBot 每周推荐书单"},
+    "monthly": {"en": "Your Monthly BookBot Recommendations", "zh": "BookBot 每月推荐书单"},
+}
+
+
+def _make_labels(lang: str, frequency: str) -> dict[str, str]:
+    """Resolve every language/frequency-dependent string used in an email."""
+    is_zh = lang == "zh"
+    freq_label = _FREQ_LABELS[frequency][lang]
+    return {
+        # RFC 2047-encoded so the raw message headers stay ASCII
+        "subject": Header(_FREQ_SUBJECTS[frequency][lang], "utf-8").encode(),
+        "header_label": f"{freq_label} Recommendations" if not is_zh else f"{freq_label}推荐",
+        "greeting": "Hi there!" if not is_zh else "你好！",
+        "intro": _FREQ_INTROS[frequency][lang],
+        "footer_text": (
+            f"You received this because you subscribed to BookBot {freq_label.lower()} recommendations."
+            if not is_zh
+            else f"你收到此邮件是因为你订阅了 BookBot 的{freq_label}推荐。"
+        ),
+        "unsub_text": "Unsubscribe" if not is_zh else "取消订阅",
+        "by_text": "by" if not is_zh else "作者：",
+        "pick_label": "Pick" if not is_zh else "推荐",
+        "search_prefix": (
+            "https://search.douban.com/book/subject_search?search_text="
+            if is_zh
+            else "https://www.google.com/search?tbm=bks&q="
+        ),
     }
-    freq_label = freq_labels.get(frequency, freq_labels["monthly"])["zh" if is_zh else "en"]
-
-    greeting = "Hi there!" if not is_zh else "你好！"
-    intro = freq_intros.get(frequency, freq_intros["monthly"])["zh" if is_zh else "en"]
-    footer_text = (
-        f"You received this because you subscribed to BookBot {freq_label.lower()} recommendations."
-        if not is_zh
-        else f"你收到此邮件是因为你订阅了 BookBot 的{freq_label}推荐。"
-    )
-    unsub_text = "Unsubscribe" if not is_zh else "取消订阅"
-    by_text = "by" if not is_zh else "作者："
 
-    book_rows = ""
-    for i, rec in enumerate(recs, 1):
-        query = urllib.parse.quote(f"{rec['title']} {rec['author']}")
-        if is_zh:
-            search_url = f"https://search.douban.com/book/subject_search?search_text={query}"
-            zlib_url = f"https://zh.zlib.li/s/{urllib.parse.quote(rec['title'])}"
-        else:
-            search_url = f"https://www.google.com/search?tbm=bks&q={query}"
 
-        links_html = f'<a href="{search_url}" style="color:#4f6d7a;text-decoration:none;" target="_blank">{rec["title"]} &#8599;</a>'
-        if is_zh:
-            links_html += (
-                f' &nbsp;|&nbsp; '
-                f'<a href="{zlib_url}" style="color:#4f6d7a;text-decoration:none;font-size:13px;" target="_blank">Z-Library &#8599;</a>'
-            )
+_EMAIL_LABELS = {
+    (lang, frequency): _make_labels(lang, frequency)
+    for lang in ("en", "zh")
+    for frequency in _FREQ_LABELS
+}
+
+
+def _email_labels(language: str, frequency: str) -> dict[str, str]:
+    """Return the label set for *language*/*frequency*.
+
+    Unknown languages fall back to English and unknown frequencies to monthly.
+    """
+    labels = _EMAIL_LABELS.get((language, frequency))
+    if labels is None:
+        lang = "zh" if language == "zh" else "en"
+        labels = _EMAIL_LABELS.get((lang, frequency)) or _EMAIL_LABELS[(lang, "monthly")]
+    return labels
 
-        book_rows += f"""\
-        <tr>
-          <td style="padding:16px 20px;border-bottom:1px solid #e2e0dd;">
-            <div style="font-size:13px;color:#6b6b6b;text-transform:uppercase;letter-spacing:0.05em;margin-bottom:4px;">
-              {"Pick" if not is_zh else "推荐"} {i}
-            </div>
-            <div style="font-size:17px;font-weight:600;color:#2c2c2c;margin-bottom:4px;">
-              {links_html}
-            </div>
-            <div style="font-size:14px;color:#6b6b6b;margin-bottom:8px;">
-              {by_text} {rec["author"]} &middot; {rec["publication_year"]}
-            </div>
-            <div style="font-size:15px;color:#2c2c2c;line-height:1.5;">
-              {rec["explanation"]}
-            </div>
-          </td>
-        </tr>
-"""
 
-    return f"""\
+# Outer HTML layout of the recommendation email; filled in by _build_html()
+_EMAIL_SHELL = """\
 <!DOCTYPE html>
 <html>
 <head><meta charset="UTF-8"></head>
@@ -97,7 +108,7 @@ def _build_html(recs: list[dict], language: str, unsubscribe_url: str, frequency
             <td style="padding:32px 24px 16px;text-align:center;">
               <div style="font-size:24px;font-weight:700;color:#2c2c2c;letter-spacing:-0.02em;">BookBot</div>
               <div style="font-size:15px;color:#6b6b6b;margin-top:4px;">
-                {f"{freq_label} Recommendations" if not is_zh else f"{freq_label}推荐"}
+                {header_label}
               </div>
             </td>
           </tr>
@@ -126,45 +137,194 @@ def _build_html(recs: list[dict], language: str, unsubscribe_url: str, frequency
 """
 
 
+# One book row of the email; filled in by _build_html()
+_BOOK_ROW = """\
+        <tr>
+          <td style="padding:16px 20px;border-bottom:1px solid #e2e0dd;">
+            <div style="font-size:13px;color:#6b6b6b;text-transform:uppercase;letter-spacing:0.05em;margin-bottom:4px;">
+              {pick_label} {index}
+            </div>
+            <div style="font-size:17px;font-weight:600;color:#2c2c2c;margin-bottom:4px;">
+              {links_html}
+            </div>
+            <div style="font-size:14px;color:#6b6b6b;margin-bottom:8px;">
+              {by_text} {author} &middot; {year}
+            </div>
+            <div style="font-size:15px;color:#2c2c2c;line-height:1.5;">
+              {explanation}
+            </div>
+          </td>
+        </tr>
+"""
+_SEARCH_LINK = '<a href="{url}" style="color:#4f6d7a;text-decoration:none;" target="_blank">{title} &#8599;</a>'
+_ZLIB_LINK = (
+    ' &nbsp;|&nbsp; '
+    '<a href="https://zh.zlib.li/s/{quoted_title}" style="color:#4f6d7a;text-decoration:none;font-size:13px;" target="_blank">Z-Library &#8599;</a>'
+)
+
+
+# Stands in for the per-recipient unsubscribe URL inside cached bodies
+_UNSUBSCRIBE_PLACEHOLDER = "{{UNSUBSCRIBE_URL}}"
+
+
+def _build_html(recs: list[Recommendation], language: str, unsubscribe_url: str, frequency: str = "monthly") -> str:
+    """Render an HTML email body for recommendations."""
+    rec_key = tuple(
+        (rec.title, rec.author, rec.publication_year, rec.explanation) for rec in recs
+    )
+    body = _build_html_body(rec_key, language, frequency)
+    return body.replace(_UNSUBSCRIBE_PLACEHOLDER, unsubscribe_url)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_html_body(
+    rec_key: tuple[tuple[str, str, int, str], ...], language: str, frequency: str
+) -> str:
+    """Render the recipient-independent email body, memoised so subscribers
+    sharing a set of picks only pay for one render."""
+    is_zh = language == "zh"
+    labels = _email_labels(language, frequency)
+    by_text = labels["by_text"]
+    pick_label = labels["pick_label"]
+    search_prefix = labels["search_prefix"]
+
+    rows: list[str] = []
+    for i, (title, author, year, explanation) in enumerate(rec_key, 1):
+        links_html = _SEARCH_LINK.format(
+            url=search_prefix + _quote(f"{title} {author}"), title=title
+        )
+        if is_zh:
+            links_html += _ZLIB_LINK.format(quoted_title=_quote(title))
+
+        rows.append(_BOOK_ROW.format(
+            pick_label=pick_label,
+            index=i,
+            links_html=links_html,
+            by_text=by_text,
+            author=author,
+            year=year,
+            explanation=explanation,
+        ))
+
+    return _EMAIL_SHELL.format_map(
+        {**labels, "book_rows": "".join(rows), "unsubscribe_url": _UNSUBSCRIBE_PLACEHOLDER}
+    )
+
+
+class MailerSession:
+    """One authenticated SMTP connection reused for a batch of emails.
+
+    Connects lazily on the first send, pings the server with NOOP before
+    each later send, and reconnects if the server has dropped the link.
+    """
+
+    def __init__(self) -> None:
+        self._server: smtplib.SMTP | None = None
+
+    def __enter__(self) -> "MailerSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _open(self) -> None:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        try:
+            server.ehlo()
+            server.starttls()
+            server.ehlo()
+            server.login(SMTP_USER, SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def send(self, to_email: str, msg: bytes) -> None:
+        """Send the raw message *msg* to *to_email*, (re)connecting as needed."""
+        if self._server is not None:
+            try:
+                self._server.noop()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._server is None:
+            self._open()
+        # Non-ASCII addresses can only travel in an SMTPUTF8 transaction
+        mail_options = () if msg.isascii() else ("SMTPUTF8",)
+        self._server.sendmail(EMAIL_FROM, [to_email], msg, mail_options)
+
+    def close(self) -> None:
+        """Close the connection, ignoring errors from a dead link."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+# Headers of every recommendation email: one base64 text/html part.
+# Filled per recipient instead of going through the email package.
+_RAW_HEADERS = (
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: text/html; charset=utf-8\r\n"
+    "Content-Transfer-Encoding: base64\r\n"
+    "Subject: {subject}\r\n"
+    "From: {sender}\r\n"
+    "To: {to}\r\n"
+    "List-Unsubscribe: <{unsubscribe_url}>\r\n"
+    "\r\n"
+)
+
+
+def _build_message(
+    to_email: str,
+    recs: list[Recommendation],
+    language: str,
+    unsubscribe_token: str,
+    frequency: str,
+) -> bytes:
+    """Assemble the raw RFC 822 bytes for a recommendation email.
+
+    Headers are UTF-8 when an address is non-ASCII (RFC 6532); ``send``
+    then asks the server for SMTPUTF8.
+    """
+    unsubscribe_url = f"{BASE_URL}/api/unsubscribe/{unsubscribe_token}"
+    headers = _RAW_HEADERS.format(
+        subject=_email_labels(language, frequency)["subject"],
+        sender=EMAIL_FROM,
+        to=to_email,
+        unsubscribe_url=unsubscribe_url,
+    )
+    html_body = _build_html(recs, language, unsubscribe_url, frequency)
+    body = base64.encodebytes(html_body.encode("utf-8")).replace(b"\n", b"\r\n")
+    return headers.encode("utf-8") + body
+
+
 def send_recommendations_email(
     to_email: str,
-    recs: list[dict],
+    recs: list[Recommendation],
     language: str,
     unsubscribe_token: str,
     frequency: str = "monthly",
+    session: MailerSession | None = None,
 ) -> bool:
     """Send a recommendation email.
 
+    Pass a ``MailerSession`` as *session* to reuse one SMTP connection
+    across a batch; otherwise a connection is opened just for this email.
     Returns True on success, False on failure.
     """
     if not SMTP_USER or not SMTP_PASSWORD:
         logging.error("SMTP credentials not configured — skipping email to %s", to_email)
         return False
 
-    freq_subjects = {
-        "daily":   {"en": "Your Daily BookBot Recommendations",   "zh": "BookBot 每日推荐书单"},
-        "weekly":  {"en": "Your Weekly BookBot Recommendations",  "zh": "BookBot 每周推荐书单"},
-        "monthly": {"en": "Your Monthly BookBot Recommendations", "zh": "BookBot 每月推荐书单"},
-    }
-    unsubscribe_url = f"{BASE_URL}/api/unsubscribe/{unsubscribe_token}"
-    subject = freq_subjects.get(frequency, freq_subjects["monthly"])["zh" if language == "zh" else "en"]
-
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = EMAIL_FROM
-    msg["To"] = to_email
-    msg["List-Unsubscribe"] = f"<{unsubscribe_url}>"
-
-    html_body = _build_html(recs, language, unsubscribe_url, frequency)
-    msg.attach(MIMEText(html_body, "html", "utf-8"))
-
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(EMAIL_FROM, [to_email], msg.as_string())
+        msg = _build_message(to_email, recs, language, unsubscribe_token, frequency)
+        if session is not None:
+            session.send(to_email, msg)
+        else:
+            with MailerSession() as own_session:
+                own_session.send(to_email, msg)
         logging.info("Email sent to %s", to_email)
         return True
     except Exception as exc:
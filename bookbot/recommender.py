@@ -1,28 +1,93 @@
 """Core recommendation engine — prompt construction, LLM calls, parsing, and validation."""
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+import httpx
 import json
+import openai
+import orjson
 import re
 import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
 
 from bookbot.i18n import get_language
 
 load_dotenv()
 
-client = OpenAI()
+# ---------------------------------------------------------------------------
+# LLM client
+# ---------------------------------------------------------------------------
+# Long-lived connection pool so calls after the first skip TCP/TLS setup
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+_HTTP_TIMEOUT = 30.0
+
+client = OpenAI(http_client=httpx.Client(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS))
 
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 MAX_RETRIES = 1  # single attempt per call; outer callers handle retries
 
+# Chat completion settings shared by the sync and async call paths.
+# JSON mode guarantees the reply is a single bare JSON object.
+_COMPLETION_PARAMS = {
+    "model": "gpt-4o",
+    "temperature": 0.3,
+    "max_tokens": 1024,
+    "response_format": {"type": "json_object"},
+}
+
+# Errors that will fail the same way on every retry (bad key, no access,
+# oversized request); callers give up at once instead of retrying.
+_FATAL_LLM_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.BadRequestError,
+)
+# Transient errors worth another attempt, after a backoff (see retry_delay)
+_RETRYABLE_LLM_ERRORS = (openai.RateLimitError, openai.APIConnectionError)
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the LLM rejected a request in a way retrying cannot fix."""
+
+
+class LLMTransientError(RuntimeError):
+    """Raised on a rate limit or connection failure; retry after a backoff."""
+
+
+# Fall back to the fence-stripping / extraction parser when a reply is not
+# plain JSON.  Kept for one release after switching to JSON mode.
+LEGACY_PARSE = True
+
 FAMILIARITY_MAP = {
     1: "very familiar, well-known classics and bestsellers",
     2: "mostly familiar titles with a few lesser-known picks",
     3: "a mix of familiar favorites and hidden gems",
     4: "surprise me with unexpected, lesser-known books",
 }
+# Valid familiarity levels, for membership checks on user input
+_FAMILIARITY_LEVELS = frozenset(FAMILIARITY_MAP)
+
+# Patterns used by parse_llm_output()
+# The language tag is optional, so this also matches bare closing fences
+_FENCE_RE = re.compile(r"```(?:json)?\s*")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+@dataclass(frozen=True, slots=True)
+class Recommendation:
+    """A single validated book recommendation."""
+
+    title: str
+    author: str
+    publication_year: int
+    explanation: str
+
 
 _SYSTEM_PROMPT_EN = """\
 Role: Act as an expert Librarian and Bibliophile with 20+ years of experience in literary curation and reader advisory. You specialize in identifying nuanced patterns in a reader’s taste to provide deeply personalized recommendations.
@@ -75,11 +140,17 @@ _SYSTEM_PROMPT_ZH = """\
 * 禁止捏造： 请反复确认每本书的书名和作者。书名必须是正式出版物上的官方译名，严禁自行意译。优先推荐知名度高、在豆瓣有词条的书籍，以降低出错风险。"""
 
 
-def get_system_prompt() -> str:
-    """Return the system prompt matching the active language."""
-    if get_language() == "zh":
-        return _SYSTEM_PROMPT_ZH
-    return _SYSTEM_PROMPT_EN
+_SYSTEM_PROMPTS = {"en": _SYSTEM_PROMPT_EN, "zh": _SYSTEM_PROMPT_ZH}
+
+# Pre-built system messages, shared by every call that uses a stock prompt
+_SYSTEM_MSG_EN = {"role": "system", "content": _SYSTEM_PROMPT_EN}
+_SYSTEM_MSG_ZH = {"role": "system", "content": _SYSTEM_PROMPT_ZH}
+_SYSTEM_MESSAGES = {_SYSTEM_PROMPT_EN: _SYSTEM_MSG_EN, _SYSTEM_PROMPT_ZH: _SYSTEM_MSG_ZH}
+
+
+def get_system_prompt(lang: str | None = None) -> str:
+    """Return the system prompt for *lang*, defaulting to the active language."""
+    return _SYSTEM_PROMPTS.get(lang or get_language(), _SYSTEM_PROMPT_EN)
 
 
 # ===================================================================
@@ -95,58 +166,263 @@ def build_user_prompt(prefs: dict, exclude: list[str] | None = None) -> str:
     books_str = ", ".join(prefs["favorite_books"])
     fam_desc = FAMILIARITY_MAP[prefs["familiarity_level"]]
 
-    prompt = (
+    exclude_block = (
+        "IMPORTANT: Do NOT recommend any of these books, "
+        "which have already been suggested:\n"
+        + "\n".join(f"  - {title}" for title in exclude)
+        + "\n\n"
+    ) if exclude else ""
+
+    return (
         f"I enjoy these genres: {genres_str}.\n"
         f"Some books I love: {books_str}.\n"
         f"For familiarity, I'd like: {fam_desc}.\n\n"
-    )
-
-    if exclude:
-        prompt += (
-            "IMPORTANT: Do NOT recommend any of these books, "
-            "which have already been suggested:\n"
-            + "\n".join(f"  - {title}" for title in exclude)
-            + "\n\n"
-        )
-
-    prompt += (
+        f"{exclude_block}"
         "Please recommend 3 to 5 books as a single JSON object with key "
         '"recommendations" containing an array of objects with keys: '
         "title, author, publication_year, explanation."
     )
-    return prompt
 
 
 # ===================================================================
 # LAYER 3: LLM CALL
 # ===================================================================
+def new_async_client() -> AsyncOpenAI:
+    """Return an ``AsyncOpenAI`` client with the same pooled transport settings.
+
+    Create it inside the event loop that will use it; its pool is bound
+    to that loop.
+    """
+    return AsyncOpenAI(
+        http_client=httpx.AsyncClient(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS)
+    )
+
+
+def build_messages_prefix(system_prompt: str) -> list[dict]:
+    """Wrap *system_prompt* into the leading chat messages sent on every call.
+
+    Build this once per request and pass it to ``call_llm_prepared`` so
+    retries only append the user turn.
+    """
+    msg = _SYSTEM_MESSAGES.get(system_prompt)
+    if msg is None:
+        msg = {"role": "system", "content": system_prompt}
+    return [msg]
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before retrying after attempt number *attempt* failed."""
+    return 0.5 * 2 ** (attempt - 1)
+
+
 def call_llm(system_prompt: str, user_prompt: str) -> str | None:
-    """Send the prompt to the LLM. Retries on failure.
-    Returns raw string output or None on unrecoverable error."""
+    """Send the prompt to the LLM.
+    Returns raw string output or None if every attempt failed.
+    Raises ``LLMUnavailableError`` on auth, permission, or bad-request errors,
+    and ``LLMTransientError`` on rate limits or connection failures so the
+    caller can back off (``retry_delay``) before its next attempt."""
+    return call_llm_prepared(build_messages_prefix(system_prompt), user_prompt)
+
+
+class _RecommendationStream:
+    """Incrementally scan streamed JSON text for recommendation objects.
+
+    ``feed`` returns every object inside the top-level ``"recommendations"``
+    array whose closing brace has arrived, so callers can react before the
+    reply finishes.  Objects nested anywhere else are ignored.  Once the
+    top-level object has closed, ``end`` holds the offset just past it and
+    the scanner ignores anything fed afterwards.
+    """
+
+    def __init__(self, collect_items: bool = True) -> None:
+        self._collect = collect_items
+        self._text = ""
+        self._pos = 0
+        self._stack: list[str] = []  # open "{" / "[" containers
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1  # start of a string directly in the top object
+        self._last_key = ""
+        self._in_recs = False  # inside the top-level "recommendations" array
+        self._item_start = -1
+        self.end = -1
+
+    def feed(self, piece: str) -> list[dict]:
+        self._text += piece
+        done: list[dict] = []
+        if self.end >= 0:
+            return done
+        text = self._text
+        stack = self._stack
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_start >= 0:
+                        self._last_key = text[self._string_start + 1:i]
+                        self._string_start = -1
+            elif c == '"':
+                self._in_string = True
+                if len(stack) == 1:
+                    self._string_start = i
+            elif c == "[":
+                if len(stack) == 1:
+                    self._in_recs = self._last_key == "recommendations"
+                stack.append(c)
+            elif c == "]" and stack:
+                stack.pop()
+                if len(stack) == 1:
+                    self._in_recs = False
+            elif c == "{":
+                stack.append(c)
+                if self._in_recs and len(stack) == 3:
+                    self._item_start = i
+            elif c == "}" and stack:
+                if len(stack) == 3 and self._item_start >= 0:
+                    if self._collect:
+                        try:
+                            item = json.loads(text[self._item_start:i + 1])
+                        except json.JSONDecodeError:
+                            item = None
+                        if isinstance(item, dict):
+                            done.append(item)
+                    self._item_start = -1
+                stack.pop()
+                if not stack:
+                    self.end = i + 1
+                    break
+        self._pos = len(text)
+        return done
+
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_MODE = _COMPLETION_PARAMS.get("response_format", {}).get("type") == "json_object"
+
+
+def _early_decode(text: str, end: int) -> str | None:
+    """Return the complete top-level object ending at *end*, if it decodes.
+
+    In JSON mode the first balanced object is the whole answer, so once it
+    decodes there is no reason to wait for the rest of the stream.
+    """
+    start = text.find("{")
+    if start < 0 or "```" in text[:start]:
+        return None
+    try:
+        obj, stop = _JSON_DECODER.raw_decode(text, start)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(obj, dict) or stop != end:
+        return None
+    return text[:stop]
+
+
+def call_llm_prepared(
+    messages_prefix: list[dict],
+    user_prompt: str,
+    on_recommendation: Callable[[dict], None] | None = None,
+) -> str | None:
+    """Like ``call_llm``, but takes a prefix from ``build_messages_prefix``.
+
+    The reply is streamed.  If *on_recommendation* is given it is called
+    with each (unvalidated) recommendation object as soon as it has fully
+    arrived; the complete raw text is still returned at the end.  In JSON
+    mode the stream is closed as soon as the reply object has been decoded.
+    Raises ``LLMUnavailableError`` and ``LLMTransientError`` like ``call_llm``.
+    """
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             logging.info("LLM call attempt %d", attempt)
             response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,
-                max_tokens=1024,
+                messages=[*messages_prefix, {"role": "user", "content": user_prompt}],
+                stream=True,
+                **_COMPLETION_PARAMS,
             )
-            raw = response.choices[0].message.content
+            scanner = (
+                _RecommendationStream(collect_items=on_recommendation is not None)
+                if on_recommendation or _JSON_MODE else None
+            )
+            chunks: list[str] = []
+            raw = None
+            for event in response:
+                if not event.choices:
+                    continue
+                piece = event.choices[0].delta.content
+                if not piece:
+                    continue
+                chunks.append(piece)
+                if scanner is None:
+                    continue
+                for rec in scanner.feed(piece):
+                    on_recommendation(rec)
+                if _JSON_MODE and scanner.end >= 0:
+                    raw = _early_decode("".join(chunks), scanner.end)
+                    if raw is not None:
+                        # Nothing after the object matters; stop downloading
+                        response.close()
+                        break
+            if raw is None:
+                raw = "".join(chunks)
             if not raw or not raw.strip():
                 logging.warning("Empty LLM response on attempt %d", attempt)
                 continue
             logging.info("LLM raw output (attempt %d): %s", attempt, raw)
             return raw
 
+        except _FATAL_LLM_ERRORS as exc:
+            logging.error("LLM call rejected, not retrying: %s", exc)
+            raise LLMUnavailableError(str(exc)) from exc
+        except _RETRYABLE_LLM_ERRORS as exc:
+            logging.error("LLM call error (attempt %d): %s", attempt, exc)
+            raise LLMTransientError(str(exc)) from exc
         except Exception as exc:
             logging.error("LLM call error (attempt %d): %s", attempt, exc)
             if attempt < MAX_RETRIES:
-                print("  (Retrying LLM call...)")
+                logging.info("Retrying LLM call (attempt %d/%d)", attempt + 1, MAX_RETRIES)
+                continue
+
+    logging.error("All LLM call attempts failed.")
+    return None
+
+
+async def call_llm_async(
+    system_prompt: str,
+    user_prompt: str,
+    llm: AsyncOpenAI,
+) -> str | None:
+    """Async counterpart of ``call_llm`` for fanning out many requests.
+
+    *llm* must be owned by the running event loop (see
+    ``new_async_client``), since its connection pool is tied to that loop.
+    Raises ``LLMUnavailableError`` and ``LLMTransientError`` like ``call_llm``.
+    """
+    messages = [*build_messages_prefix(system_prompt), {"role": "user", "content": user_prompt}]
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            logging.info("Async LLM call attempt %d", attempt)
+            response = await llm.chat.completions.create(
+                messages=messages, **_COMPLETION_PARAMS
+            )
+            raw = response.choices[0].message.content
+            if not raw or not raw.strip():
+                logging.warning("Empty LLM response on attempt %d", attempt)
                 continue
+            logging.info("LLM raw output (attempt %d): %s", attempt, raw)
+            return raw
+
+        except _FATAL_LLM_ERRORS as exc:
+            logging.error("LLM call rejected, not retrying: %s", exc)
+            raise LLMUnavailableError(str(exc)) from exc
+        except _RETRYABLE_LLM_ERRORS as exc:
+            logging.error("LLM call error (attempt %d): %s", attempt, exc)
+            raise LLMTransientError(str(exc)) from exc
+        except Exception as exc:
+            logging.error("LLM call error (attempt %d): %s", attempt, exc)
 
     logging.error("All LLM call attempts failed.")
     return None
@@ -155,14 +431,80 @@ def call_llm(system_prompt: str, user_prompt: str) -> str | None:
 # ===================================================================
 # LAYER 4: OUTPUT PARSING
 # ===================================================================
+def _extract_json_span(s: str) -> tuple[int, int] | None:
+    """Return ``(start, end)`` of the first balanced ``{...}`` in *s*.
+
+    Single forward pass that tracks brace depth and skips braces inside
+    JSON string literals.  Returns None if no object closes.
+    """
+    start = s.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(s)):
+        c = s[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+
+def _is_trailing_comma_error(exc: json.JSONDecodeError) -> bool:
+    """Return True if *exc* was raised at a ``}`` or ``]`` following a comma."""
+    return exc.doc[exc.pos:exc.pos + 1] in ("}", "]")
+
+
 def parse_llm_output(raw: str) -> dict | None:
-    """Extract a JSON object from the LLM's raw text.
-    Handles pure JSON, markdown-fenced JSON, and extra surrounding text.
+    """Decode the LLM's JSON-mode reply.
     Returns parsed dict or None."""
+    try:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        data = orjson.loads(raw)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+
+    if LEGACY_PARSE:
+        return _parse_llm_output_legacy(raw)
+
+    logging.error("Output parsing failed. Raw output preserved:\n%s", raw)
+    return None
+
+
+def _parse_llm_output_legacy(raw: str) -> dict | None:
+    """Extract a JSON object from free-form LLM text.
+    Handles markdown-fenced JSON, trailing commas, and extra surrounding text.
+    Returns parsed dict or None."""
+
+    # Step 0: a bare object with a trailing comma can be fixed right away
+    stripped = raw.strip()
+    if stripped[:1] == "{":
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError as exc:
+            if _is_trailing_comma_error(exc):
+                try:
+                    return json.loads(_TRAILING_COMMA_RE.sub(r"\1", stripped))
+                except json.JSONDecodeError:
+                    pass
 
     # Step 1: strip markdown code fences if present
-    cleaned = re.sub(r"```(?:json)?\s*", "", raw)
-    cleaned = re.sub(r"```", "", cleaned).strip()
+    cleaned = _FENCE_RE.sub("", raw).strip()
 
     # Step 2: try direct parse
     try:
@@ -172,20 +514,22 @@ def parse_llm_output(raw: str) -> dict | None:
     except json.JSONDecodeError:
         pass
 
-    # Step 3: locate first { ... } block (greedy to capture nested braces)
-    match = re.search(r"\{.*\}", cleaned, re.DOTALL)
-    if match:
+    # Step 3: locate the first balanced { ... } block
+    span = _extract_json_span(cleaned)
+    block = cleaned[span[0]:span[1]] if span else None
+    trailing_comma = False
+    if block:
         try:
-            data = json.loads(match.group())
+            data = json.loads(block)
             if isinstance(data, dict):
                 return data
-        except json.JSONDecodeError:
-            pass
+        except json.JSONDecodeError as exc:
+            trailing_comma = _is_trailing_comma_error(exc)
 
-    # Step 4: minimal cleanup attempt (trailing commas, etc.)
-    if match:
-        attempt = match.group()
-        attempt = re.sub(r",\s*([}\]])", r"\1", attempt)  # trailing commas
+    # Step 4: minimal cleanup attempt, only when the decoder tripped on a
+    # closing bracket (the signature of a trailing comma)
+    if trailing_comma:
+        attempt = _TRAILING_COMMA_RE.sub(r"\1", block)  # trailing commas
         try:
             data = json.loads(attempt)
             if isinstance(data, dict):
@@ -197,45 +541,92 @@ def parse_llm_output(raw: str) -> dict | None:
     return None
 
 
+def repair_llm_output(raw: str) -> dict | None:
+    """Last-chance salvage of a response that ``parse_llm_output`` rejected.
+
+    Strips markdown fences and parses the outermost ``[...]`` span as the
+    recommendations array, which recovers bare arrays and objects whose
+    wrapper was mangled.  Cheap compared to another LLM round trip.
+    Returns ``{"recommendations": [...]}`` or None.
+    """
+    cleaned = raw.replace("```json", "").replace("```", "")
+    start = cleaned.find("[")
+    end = cleaned.rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(cleaned[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, list):
+        return None
+    logging.info("Recovered recommendations array from unparsable output.")
+    return {"recommendations": data}
+
+
 # ===================================================================
 # LAYER 5: BUSINESS LOGIC VALIDATION
 # ===================================================================
+def canonical_title(title: str) -> str:
+    """Normalise *title* for duplicate checks (stripped and lowercased)."""
+    return title.strip().lower()
+
+
 def validate_recommendation(rec: dict, prefs: dict) -> bool:
     """Return True if a single recommendation dict is valid."""
-    # Required fields
-    for field in ("title", "author", "publication_year", "explanation"):
-        if field not in rec:
-            logging.warning("Missing field '%s' in recommendation: %s", field, rec)
-            return False
+    if not isinstance(rec, dict):
+        logging.warning("Recommendation is not an object: %s", rec)
+        return False
+
+    # Required fields — read each once; only look for the culprit on failure
+    title = rec.get("title")
+    author = rec.get("author")
+    explanation = rec.get("explanation")
+    raw_year = rec.get("publication_year")
+    if None in (title, author, explanation, raw_year):
+        for field in ("title", "author", "publication_year", "explanation"):
+            if rec.get(field) is None:
+                logging.warning("Missing field '%s' in recommendation: %s", field, rec)
+                break
+        return False
 
-    if not isinstance(rec["title"], str) or not rec["title"].strip():
+    if not isinstance(title, str) or not title.strip():
         return False
-    if not isinstance(rec["author"], str) or not rec["author"].strip():
+    if not isinstance(author, str) or not author.strip():
         return False
-    if not isinstance(rec["explanation"], str) or not rec["explanation"].strip():
+    if not isinstance(explanation, str) or not explanation.strip():
         return False
 
     # Publication year sanity
     try:
-        year = int(rec["publication_year"])
+        year = int(raw_year)
     except (ValueError, TypeError):
-        logging.warning("Invalid publication_year: %s", rec["publication_year"])
+        logging.warning("Invalid publication_year: %s", raw_year)
         return False
     if year < 1450 or year > 2026:
-        logging.warning("Suspicious year %d for '%s'", year, rec["title"])
+        logging.warning("Suspicious year %d for '%s'", year, title)
         return False
 
     # Explanation length bounds (at least 10 chars, at most 1000)
-    if len(rec["explanation"]) < 10 or len(rec["explanation"]) > 1000:
-        logging.warning("Explanation length out of bounds for '%s'", rec["title"])
+    if len(explanation) < 10 or len(explanation) > 1000:
+        logging.warning("Explanation length out of bounds for '%s'", title)
         return False
 
     return True
 
 
-def validate_recommendations(parsed: dict, prefs: dict) -> list[dict] | None:
+def validate_recommendations(
+    parsed: dict,
+    prefs: dict,
+    exclude: frozenset[str] | set[str] | None = None,
+) -> list[Recommendation] | None:
     """Validate the full parsed response.
-    Returns a list of 3-5 valid recommendations or None."""
+    Returns a list of 3-5 valid recommendations or None.
+
+    *exclude* holds canonical titles (see ``canonical_title``) already
+    recommended; matching items are dropped after the minimum-count check,
+    so the result may be empty when every title was a repeat.
+    """
 
     recs = parsed.get("recommendations")
     if not isinstance(recs, list):
@@ -247,23 +638,98 @@ def validate_recommendations(parsed: dict, prefs: dict) -> list[dict] | None:
         logging.info("Received %d recommendations; truncating to 5.", len(recs))
         recs = recs[:5]
 
-    # Validate each
-    valid = [r for r in recs if validate_recommendation(r, prefs)]
-
-    # Check for duplicate titles
-    seen = set()
-    deduped = []
-    for r in valid:
-        key = r["title"].strip().lower()
-        if key not in seen:
-            seen.add(key)
-            deduped.append(r)
-    if len(deduped) < len(valid):
-        logging.warning("Duplicate titles removed.")
-    valid = deduped
+    # Validate and dedup in one pass (first occurrence of a title wins)
+    seen: set[str] = set()
+    valid = []
+    for r in recs:
+        if not validate_recommendation(r, prefs):
+            continue
+        key = canonical_title(r["title"])
+        if key in seen:
+            logging.warning("Duplicate title removed: %s", r["title"])
+            continue
+        seen.add(key)
+        valid.append((key, r))
 
     if len(valid) < 3:
         logging.error("Only %d valid recommendations (need 3).", len(valid))
         return None
 
-    return valid[:5]
+    if exclude:
+        count = len(valid)
+        valid = [(key, r) for key, r in valid if key not in exclude]
+        if len(valid) < count:
+            logging.info(
+                "Removed %d duplicate(s) that were already recommended.",
+                count - len(valid),
+            )
+
+    return [
+        Recommendation(
+            title=r["title"],
+            author=r["author"],
+            publication_year=int(r["publication_year"]),
+            explanation=r["explanation"],
+        )
+        for _, r in valid
+    ]
+
+
+# ===================================================================
+# RESULT CACHE
+# ===================================================================
+_CACHE_SIZE = 512
+# Entries expire so repeat requests eventually get fresh picks
+_CACHE_TTL = 3600.0  # seconds
+
+# key -> (expiry on the time.monotonic() clock, recommendations)
+_rec_cache: OrderedDict[tuple, tuple[float, tuple[Recommendation, ...]]] = OrderedDict()
+_rec_cache_lock = threading.Lock()
+
+
+def recommendation_cache_key(
+    prefs: dict,
+    exclude: list[str] | None,
+    lang: str,
+    owner: int | None = None,
+) -> tuple:
+    """Canonical, hashable key for a recommendation request.
+
+    *owner* (e.g. a subscription id) scopes the entry to one subscriber;
+    pass it whenever *exclude* is that subscriber's own history.
+    """
+    return (
+        lang,
+        tuple(sorted(prefs["genres"])),
+        tuple(sorted(prefs["favorite_books"])),
+        prefs["familiarity_level"],
+        tuple(sorted(exclude or ())),
+        owner,
+    )
+
+
+def get_cached_recommendations(key: tuple) -> list[Recommendation] | None:
+    """Return a copy of the cached result for *key*, or None on a miss.
+
+    Expired entries count as a miss and are dropped.
+    """
+    with _rec_cache_lock:
+        entry = _rec_cache.get(key)
+        if entry is None:
+            return None
+        expires, recs = entry
+        if time.monotonic() >= expires:
+            del _rec_cache[key]
+            return None
+        _rec_cache.move_to_end(key)
+    logging.info("Recommendation cache hit.")
+    return list(recs)
+
+
+def cache_recommendations(key: tuple, recs: list[Recommendation]) -> None:
+    """Store a successful result, evicting the least recently used entry."""
+    with _rec_cache_lock:
+        _rec_cache[key] = (time.monotonic() + _CACHE_TTL, tuple(recs))
+        _rec_cache.move_to_end(key)
+        if len(_rec_cache) > _CACHE_SIZE:
+            _rec_cache.popitem(last=False)
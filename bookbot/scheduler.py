@@ -4,23 +4,33 @@ Runs once per day and dispatches to subscribers whose chosen frequency
 (daily, weekly, monthly) matches the current date.
 """
 
+import asyncio
 import datetime
 import logging
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from openai import AsyncOpenAI
 
 from bookbot.database import (
-    get_active_subscriptions,
+    get_active_subscriptions_for_frequencies,
     get_recommended_titles,
-    add_history,
+    add_history_many,
+    close_db,
 )
-from bookbot.i18n import set_language
-from bookbot.mailer import send_recommendations_email
+from bookbot.mailer import MailerSession, send_recommendations_email
 from bookbot.recommender import (
+    Recommendation,
     get_system_prompt,
     build_user_prompt,
-    call_llm,
+    cache_recommendations,
+    LLMTransientError,
+    call_llm_async,
+    canonical_title,
+    get_cached_recommendations,
+    new_async_client,
+    recommendation_cache_key,
     parse_llm_output,
+    retry_delay,
     validate_recommendations,
 )
 
@@ -28,27 +38,56 @@ from bookbot.recommender import (
 # The recommendation job
 # ---------------------------------------------------------------------------
 MAX_ATTEMPTS = 3
+MAX_CONCURRENT_LLM_CALLS = 8  # keep fan-out under the API rate limits
+_VALID_FREQUENCIES = ("daily", "weekly", "monthly")
 
 
-def _generate_for_subscriber(sub: dict) -> list[dict] | None:
-    """Generate recommendations for a single subscriber.
-
-    Returns a list of recommendation dicts, or None on failure.
-    """
-    set_language(sub["language"])
-
-    prefs = {
+def _prefs_for(sub: dict) -> dict:
+    """Return the recommender preference dict for subscriber row *sub*."""
+    return {
         "genres": sub["genres"],
         "favorite_books": sub["books"],
         "familiarity_level": sub["familiarity"],
     }
 
-    exclude = get_recommended_titles(sub["id"])
+
+async def _generate_for_subscriber(
+    sub: dict, exclude: list[str], llm: AsyncOpenAI, limit: asyncio.Semaphore
+) -> list[Recommendation] | None:
+    """Generate recommendations for a single subscriber.
+
+    *exclude* holds the titles already sent to them; *limit* bounds how
+    many LLM requests are in flight across all subscribers.  The subscriber's
+    language is passed explicitly rather than via ``set_language`` so
+    concurrent runs (and web requests) never see each other's language.
+    Returns a list of recommendations, or None on failure.  An
+    ``LLMUnavailableError`` propagates without spending further attempts;
+    rate-limit and connection errors are retried after a backoff.
+    """
+    prefs = _prefs_for(sub)
+
+    # History is per subscriber, so only history-free requests are shared
+    cache_key = recommendation_cache_key(
+        prefs, exclude, sub["language"], owner=sub["id"] if exclude else None
+    )
+    cached = get_cached_recommendations(cache_key)
+    if cached is not None:
+        return cached
+
     user_prompt = build_user_prompt(prefs, exclude=exclude or None)
-    system_prompt = get_system_prompt()
+    system_prompt = get_system_prompt(sub["language"])
+
+    seen = frozenset(canonical_title(t) for t in exclude)
 
     for attempt in range(1, MAX_ATTEMPTS + 1):
-        raw = call_llm(system_prompt, user_prompt)
+        try:
+            async with limit:
+                raw = await call_llm_async(system_prompt, user_prompt, llm)
+        except LLMTransientError:
+            # Back off outside the semaphore so other subscribers keep going
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(retry_delay(attempt))
+            continue
         if raw is None:
             logging.warning(
                 "LLM returned None for subscriber %d, attempt %d", sub["id"], attempt
@@ -62,25 +101,58 @@ def _generate_for_subscriber(sub: dict) -> list[dict] | None:
             )
             continue
 
-        final = validate_recommendations(parsed, prefs)
+        # Already-sent titles are dropped during validation
+        final = validate_recommendations(parsed, prefs, exclude=seen)
         if final is None:
             logging.warning(
                 "Validation failed for subscriber %d, attempt %d", sub["id"], attempt
             )
             continue
 
-        # Remove already-sent titles
-        if exclude:
-            seen = {t.strip().lower() for t in exclude}
-            final = [r for r in final if r["title"].strip().lower() not in seen]
-
         if final:
+            cache_recommendations(cache_key, final)
             return final
 
     logging.error("All attempts failed for subscriber %d", sub["id"])
     return None
 
 
+async def _generate_all(subs: list[dict], excludes: list[list[str]]) -> list:
+    """Generate recommendations for *subs* concurrently.
+
+    Subscribers with the same language, preferences, and history would send
+    identical prompts, so each such group makes one request and shares the
+    result.  Results line up with *subs*; each is a list of recommendations,
+    None, or the exception raised for that subscriber.  *excludes* holds
+    each subscriber's previously sent titles, read before the loop starts.
+    """
+    groups: dict[tuple, list[int]] = {}
+    for i, (sub, exclude) in enumerate(zip(subs, excludes)):
+        key = recommendation_cache_key(_prefs_for(sub), exclude, sub["language"])
+        groups.setdefault(key, []).append(i)
+    if len(groups) < len(subs):
+        logging.info(
+            "%d subscriber(s) share %d distinct request(s)", len(subs), len(groups)
+        )
+
+    limit = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+    async with new_async_client() as llm:
+        shared = await asyncio.gather(
+            *(
+                _generate_for_subscriber(subs[members[0]], excludes[members[0]], llm, limit)
+                for members in groups.values()
+            ),
+            return_exceptions=True,
+        )
+
+    results: list = [None] * len(subs)
+    for members, recs in zip(groups.values(), shared):
+        for i in members:
+            # Each subscriber gets its own list; the items are frozen
+            results[i] = list(recs) if isinstance(recs, list) else recs
+    return results
+
+
 def _should_send_today(frequency: str, today: datetime.date | None = None) -> bool:
     """Return True if a subscriber with the given frequency should receive
     recommendations today.
@@ -104,43 +176,64 @@ def _should_send_today(frequency: str, today: datetime.date | None = None) -> bo
 def send_scheduled_recommendations() -> None:
     """Iterate over all active subscribers and email those whose frequency
     matches today's date."""
+    try:
+        _send_due_recommendations()
+    finally:
+        # The job runs on a pool thread; don't leave its connection open
+        close_db()
+
+
+def _send_due_recommendations() -> None:
+    """Body of ``send_scheduled_recommendations``."""
     today = datetime.date.today()
-    subscribers = get_active_subscriptions()
+    frequencies = [f for f in _VALID_FREQUENCIES if _should_send_today(f, today)]
+    due = get_active_subscriptions_for_frequencies(frequencies)
     logging.info(
-        "Daily scheduler job started (%s) — %d active subscriber(s)",
+        "Daily scheduler job started (%s) — %d subscriber(s) due today",
         today.isoformat(),
-        len(subscribers),
+        len(due),
     )
 
-    sent_count = 0
-    for sub in subscribers:
-        freq = sub.get("frequency", "monthly")
-        if not _should_send_today(freq, today):
-            continue
-
+    for sub in due:
         logging.info(
-            "Processing subscriber %d (%s, frequency=%s)", sub["id"], sub["email"], freq
-        )
-
-        recs = _generate_for_subscriber(sub)
-        if recs is None:
-            logging.error("Skipping subscriber %d — no recommendations generated", sub["id"])
-            continue
-
-        sent = send_recommendations_email(
-            to_email=sub["email"],
-            recs=recs,
-            language=sub["language"],
-            unsubscribe_token=sub["unsubscribe_token"],
-            frequency=freq,
+            "Processing subscriber %d (%s, frequency=%s)",
+            sub["id"], sub["email"], sub.get("frequency", "monthly"),
         )
 
-        if sent:
-            titles = [r["title"] for r in recs]
-            add_history(sub["id"], titles)
-            sent_count += 1
-
-    logging.info("Scheduler job finished — sent to %d subscriber(s).", sent_count)
+    # The LLM calls are network-bound, so issue them all at once
+    # Read history before the event loop starts so no SQLite call blocks it
+    excludes = [get_recommended_titles(sub["id"]) for sub in due]
+    results = asyncio.run(_generate_all(due, excludes)) if due else []
+
+    history: list[tuple[int, list[str]]] = []
+    try:
+        # Reuse one SMTP login for every email sent in this run
+        with MailerSession() as session:
+            for sub, recs in zip(due, results):
+                if isinstance(recs, BaseException):
+                    logging.error("Skipping subscriber %d — generation raised: %s", sub["id"], recs)
+                    continue
+                if recs is None:
+                    logging.error("Skipping subscriber %d — no recommendations generated", sub["id"])
+                    continue
+
+                sent = send_recommendations_email(
+                    to_email=sub["email"],
+                    recs=recs,
+                    language=sub["language"],
+                    unsubscribe_token=sub["unsubscribe_token"],
+                    frequency=sub.get("frequency", "monthly"),
+                    session=session,
+                )
+
+                if sent:
+                    history.append((sub["id"], [r.title for r in recs]))
+    finally:
+        # One transaction for the whole run instead of a commit per
+        # subscriber; written even if the loop dies, so every email that
+        # went out is recorded
+        add_history_many(history)
+    logging.info("Scheduler job finished — sent to %d subscriber(s).", len(history))
 
 
 # Keep the old name as an alias for backwards compatibility
@@ -0,0 +1,109 @@
+"""Input validators shared by the CLI and the web interface."""
+
+import re
+import threading
+
+try:  # optional: compiles all injection patterns into one scanner
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+MAX_STRING_LENGTH = 200  # reject absurdly long input strings
+# UTF-8 cap on a book title, so CJK titles stay bounded in the prompt too
+MAX_TITLE_BYTES = 400
+# Longest all-CJK title that fits, for user-facing messages (3 bytes each)
+MAX_CJK_TITLE_LENGTH = MAX_TITLE_BYTES // 3
+
+PROMPT_INJECTION_PATTERNS = [
+    r"ignore previous instructions",
+    r"pretend you are",
+    r"disregard.*prompt",
+    r"forget your instructions",
+    r"you are now",
+    r"act as if",
+    r"new persona",
+    r"override.*system",
+]
+
+# Most patterns are plain phrases, so they are matched with a substring
+# check on the lowercased text; only the ones using regex syntax need the
+# regex engine.  Both are derived from PROMPT_INJECTION_PATTERNS so the
+# fallback always enforces the same rules as the Hyperscan path.
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+_LITERAL_TRIGGERS = tuple(
+    p.lower() for p in PROMPT_INJECTION_PATTERNS
+    if _REGEX_METACHARACTERS.isdisjoint(p)
+)
+_REGEX_TRIGGERS = tuple(
+    re.compile(p, re.IGNORECASE) for p in PROMPT_INJECTION_PATTERNS
+    if not _REGEX_METACHARACTERS.isdisjoint(p)
+)
+
+_HS_DB = None
+if hyperscan is not None:
+    _HS_DB = hyperscan.Database()
+    _HS_DB.compile(
+        expressions=[p.encode() for p in PROMPT_INJECTION_PATTERNS],
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+        * len(PROMPT_INJECTION_PATTERNS),
+    )
+# A scratch space serves one scan at a time, so each thread gets its own
+_hs_local = threading.local()
+
+
+# ===================================================================
+# VALIDATORS
+# ===================================================================
+def is_valid_book_title(title: str) -> bool:
+    """Return True if the string looks like a reasonable book title."""
+    if not title:
+        return False
+    length = len(title)
+    if length > MAX_STRING_LENGTH:
+        return False
+    # Enforce the UTF-8 size too; a character is at most 4 bytes, so short
+    # titles skip the encode entirely.
+    if length * 4 > MAX_TITLE_BYTES and len(title.encode("utf-8")) > MAX_TITLE_BYTES:
+        return False
+    # reject strings that are only symbols / punctuation
+    # allow Latin letters, digits, and CJK characters
+    for c in title:
+        o = ord(c)
+        if (
+            0x30 <= o <= 0x39      # 0-9
+            or 0x41 <= o <= 0x5A   # A-Z
+            or 0x61 <= o <= 0x7A   # a-z
+            or 0x4E00 <= o <= 0x9FFF  # CJK Unified Ideographs
+        ):
+            return True
+    return False
+
+
+def _hs_scratch():
+    """Return this thread's Hyperscan scratch space, allocating it once."""
+    scratch = getattr(_hs_local, "scratch", None)
+    if scratch is None:
+        scratch = _hs_local.scratch = hyperscan.Scratch(_HS_DB)
+    return scratch
+
+
+def contains_prompt_injection(text: str) -> bool:
+    """Return True if text matches any known prompt-injection pattern."""
+    if _HS_DB is not None:
+        # Returning True from the handler stops the scan at the first match
+        try:
+            _HS_DB.scan(
+                text.encode(),
+                match_event_handler=lambda *match: True,
+                scratch=_hs_scratch(),
+            )
+        except hyperscan.ScanTerminated:
+            return True
+        return False
+    low = text.lower()
+    if any(trigger in low for trigger in _LITERAL_TRIGGERS):
+        return True
+    return any(pattern.search(text) for pattern in _REGEX_TRIGGERS)
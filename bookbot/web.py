@@ -2,7 +2,9 @@
 
 import logging
 import re
+import time
 
+import orjson
 from flask import Flask, render_template, request, jsonify
 
 from bookbot.database import (
@@ -17,14 +19,28 @@ from bookbot.i18n import (
     GENRE_DISPLAY,
 )
 from bookbot.recommender import (
-    FAMILIARITY_MAP,
+    _FAMILIARITY_LEVELS,
+    LLMTransientError,
+    LLMUnavailableError,
     get_system_prompt,
     build_user_prompt,
+    cache_recommendations,
     call_llm,
+    canonical_title,
+    get_cached_recommendations,
+    recommendation_cache_key,
     parse_llm_output,
+    retry_delay,
     validate_recommendations,
 )
 from bookbot.scheduler import start_scheduler
+from bookbot.validation import (
+    MAX_CJK_TITLE_LENGTH,
+    MAX_STRING_LENGTH,
+    MAX_TITLE_BYTES,
+    contains_prompt_injection,
+    is_valid_book_title,
+)
 
 app = Flask(__name__)
 
@@ -43,43 +59,20 @@ def _ensure_initialised():
         _initialised = True
 
 
-# ---------------------------------------------------------------------------
-# Constants (mirrored from cli.py for web-side validation)
-# ---------------------------------------------------------------------------
-MAX_STRING_LENGTH = 200
-
-PROMPT_INJECTION_PATTERNS = [
-    r"ignore previous instructions",
-    r"pretend you are",
-    r"disregard.*prompt",
-    r"forget your instructions",
-    r"you are now",
-    r"act as if",
-    r"new persona",
-    r"override.*system",
-]
-
-
-def _is_valid_book_title(title: str) -> bool:
-    if not title or len(title) > MAX_STRING_LENGTH:
-        return False
-    if not re.search(r"[a-zA-Z0-9\u4e00-\u9fff]", title):
-        return False
-    return True
-
+def json_response(obj, status: int = 200):
+    """Serialise *obj* with orjson, which encodes the ``Recommendation``
+    dataclasses natively."""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
 
-def _contains_prompt_injection(text: str) -> bool:
-    for pattern in PROMPT_INJECTION_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
 
-
-def _filter_duplicates(recs: list[dict], already: list[str]) -> list[dict]:
-    if not already:
-        return recs
-    seen = {title.strip().lower() for title in already}
-    return [r for r in recs if r["title"].strip().lower() not in seen]
+def _book_invalid_message(title: str) -> str:
+    """Localised rejection message for *title*, naming both length limits."""
+    return t(
+        "book_invalid",
+        bad=[title],
+        max_len=MAX_STRING_LENGTH,
+        max_cjk=MAX_CJK_TITLE_LENGTH,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -88,13 +81,18 @@ def _filter_duplicates(recs: list[dict], already: list[str]) -> list[dict]:
 @app.route("/")
 def index():
     """Serve the main single-page application."""
-    return render_template("index.html")
+    return render_template(
+        "index.html",
+        max_len=MAX_STRING_LENGTH,
+        max_title_bytes=MAX_TITLE_BYTES,
+        max_cjk=MAX_CJK_TITLE_LENGTH,
+    )
 
 
 @app.route("/api/genres")
 def api_genres():
     """Return genre lists for both languages."""
-    return jsonify({
+    return json_response({
         "en": list(GENRE_DISPLAY["en"].values()),
         "zh": list(GENRE_DISPLAY["zh"].values()),
         "internal": {
@@ -148,9 +146,9 @@ def api_recommend():
         return jsonify({"error": t("book_count")}), 400
 
     for b in books:
-        if not _is_valid_book_title(b):
-            return jsonify({"error": f"Invalid book title: {b}"}), 400
-        if _contains_prompt_injection(b):
+        if not is_valid_book_title(b):
+            return jsonify({"error": _book_invalid_message(b)}), 400
+        if contains_prompt_injection(b):
             return jsonify({"error": t("book_injection")}), 400
 
     # --- Familiarity ---
@@ -159,7 +157,7 @@ def api_recommend():
         familiarity = int(familiarity)
     except (TypeError, ValueError):
         return jsonify({"error": t("fam_nan")}), 400
-    if familiarity not in FAMILIARITY_MAP:
+    if familiarity not in _FAMILIARITY_LEVELS:
         return jsonify({"error": t("fam_range")}), 400
 
     # --- Build preferences ---
@@ -170,15 +168,32 @@ def api_recommend():
     }
 
     exclude = data.get("exclude", [])
+    if not isinstance(exclude, list) or not all(isinstance(x, str) for x in exclude):
+        return jsonify({"error": "Invalid exclude list"}), 400
+
+    # Identical requests skip the whole LLM pipeline
+    cache_key = recommendation_cache_key(prefs, exclude, lang)
+    cached = get_cached_recommendations(cache_key)
+    if cached is not None:
+        return json_response({"recommendations": cached})
+
     user_prompt = build_user_prompt(prefs, exclude=exclude or None)
     logging.info("Web request — user prompt:\n%s", user_prompt)
 
     # --- Call recommender pipeline ---
     system_prompt = get_system_prompt()
     max_retries = 3
+    seen = frozenset(canonical_title(title) for title in exclude)
 
     for attempt in range(1, max_retries + 1):
-        raw = call_llm(system_prompt, user_prompt)
+        try:
+            raw = call_llm(system_prompt, user_prompt)
+        except LLMUnavailableError:
+            break
+        except LLMTransientError:
+            if attempt < max_retries:
+                time.sleep(retry_delay(attempt))
+            continue
         if raw is None:
             continue
 
@@ -186,15 +201,12 @@ def api_recommend():
         if parsed is None:
             continue
 
-        final = validate_recommendations(parsed, prefs)
-        if final is None:
-            continue
-
-        final = _filter_duplicates(final, exclude)
+        final = validate_recommendations(parsed, prefs, exclude=seen)
         if not final:
             continue
 
-        return jsonify({"recommendations": final})
+        cache_recommendations(cache_key, final)
+        return json_response({"recommendations": final})
 
     return jsonify({"error": t("fail_all")}), 500
 
@@ -204,7 +216,6 @@ def api_recommend():
 # ---------------------------------------------------------------------------
 _EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
-
 _VALID_FREQUENCIES = ("daily", "weekly", "monthly")
 
 
@@ -263,9 +274,9 @@ def api_subscribe():
         return jsonify({"error": t("book_count")}), 400
 
     for b in books:
-        if not _is_valid_book_title(b):
-            return jsonify({"error": f"Invalid book title: {b}"}), 400
-        if _contains_prompt_injection(b):
+        if not is_valid_book_title(b):
+            return jsonify({"error": _book_invalid_message(b)}), 400
+        if contains_prompt_injection(b):
             return jsonify({"error": t("book_injection")}), 400
 
     # --- Familiarity ---
@@ -274,7 +285,7 @@ def api_subscribe():
         familiarity = int(familiarity)
     except (TypeError, ValueError):
         return jsonify({"error": t("fam_nan")}), 400
-    if familiarity not in FAMILIARITY_MAP:
+    if familiarity not in _FAMILIARITY_LEVELS:
         return jsonify({"error": t("fam_range")}), 400
 
     # --- Persist ---